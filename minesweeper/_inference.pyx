@@ -0,0 +1,55 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled pair loop for MinesweeperAI.update_knowledge.
+
+Build in place from this directory with:
+
+    python setup.py build_ext --inplace
+
+minesweeper.py falls back to its pure Python loop when this
+extension has not been built.
+"""
+
+
+def infer(sentence1, list knowledge):
+    """
+    Returns (cells, count) for every sentence inferred from sentence1
+    and a proper subset or superset of it in knowledge.
+    """
+    cdef object s1c = sentence1.cells
+    cdef object s2c
+    cdef object new_cells
+    cdef Py_ssize_t ls1 = s1c.bit_count()
+    cdef Py_ssize_t ls2
+    cdef Py_ssize_t k
+    cdef Py_ssize_t n = len(knowledge)
+    cdef long s1n = sentence1.count
+    cdef long new_count
+    cdef list inferred = []
+
+    for k in range(n):
+        sentence2 = knowledge[k]
+        s2c = sentence2.cells
+        if not s2c:
+            continue
+
+        # only a strictly smaller sentence can be a proper subset; this
+        # also skips sentence1 itself and any sentence equal to it
+        ls2 = s2c.bit_count()
+        if ls2 < ls1:
+            if s1c & s2c != s2c:
+                continue
+            new_cells = s1c & ~s2c
+            new_count = s1n - <long>sentence2.count
+        elif ls2 > ls1:
+            if s1c & s2c != s1c:
+                continue
+            new_cells = s2c & ~s1c
+            new_count = <long>sentence2.count - s1n
+        else:
+            continue
+
+        if new_count >= 0:
+            inferred.append((new_cells, new_count))
+
+    return inferred
@@ -1,5 +1,113 @@
 import itertools
+import logging
 import random
+import sys
+from collections import deque
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; nearby_mines falls back to a NumPy slice
+    njit = None
+
+try:
+    from _inference import infer as _infer
+except ImportError:
+    # the Cython pair loop is optional; see _inference.pyx
+    _infer = None
+
+log = logging.getLogger(__name__)
+
+# Offsets of the 8 cells surrounding a cell
+_OFFS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def _enc(i, j, width):
+    """
+    Returns the flat index of cell (i, j) on a board of the given width.
+    """
+    return i * width + j
+
+
+def _dec(k, width):
+    """
+    Returns the (i, j) cell for a flat index.
+    """
+    return divmod(k, width)
+
+
+def _bits(mask):
+    """
+    Yields the index of every set bit in a cell bitmask,
+    lowest first.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+if njit is not None:
+    @njit(cache=True, boundscheck=False)
+    def _nearby(board, i, j, height, width):
+        """
+        Counts the mines around (i, j) on a boolean board.
+        """
+        c = 0
+        for di in range(-1, 2):
+            for dj in range(-1, 2):
+                if di == 0 and dj == 0:
+                    continue
+                ii = i + di
+                jj = j + dj
+                if 0 <= ii < height and 0 <= jj < width:
+                    c += board[ii, jj]
+        return c
+else:
+    def _nearby(board, i, j, height, width):
+        """
+        Counts the mines around (i, j) on a boolean board.
+        """
+        i0, i1 = max(i - 1, 0), min(i + 2, height)
+        j0, j1 = max(j - 1, 0), min(j + 2, width)
+        return int(board[i0:i1, j0:j1].sum()) - int(board[i, j])
+
+
+if _infer is None:
+    def _infer(sentence1, knowledge):
+        """
+        Returns (cells, count) for every sentence inferred from sentence1
+        and a proper subset or superset of it in knowledge.
+        """
+        s1c, s1n = sentence1.cells, sentence1.count
+        ls1 = s1c.bit_count()
+        inferred = []
+        for sentence2 in knowledge:
+            s2c = sentence2.cells
+            if not s2c:
+                continue
+
+            # only a strictly smaller sentence can be a proper subset; this
+            # also skips sentence1 itself and any sentence equal to it
+            ls2 = s2c.bit_count()
+            if ls2 < ls1:
+                if s1c & s2c != s2c:
+                    continue
+                new_cells = s1c & ~s2c
+                new_count = s1n - sentence2.count
+            elif ls2 > ls1:
+                if s1c & s2c != s1c:
+                    continue
+                new_cells = s2c & ~s1c
+                new_count = sentence2.count - s1n
+            else:
+                continue
+
+            if new_count >= 0:
+                inferred.append((new_cells, new_count))
+        return inferred
 
 
 class Minesweeper():
@@ -12,23 +120,14 @@ class Minesweeper():
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = np.zeros((height, width), dtype=bool)
 
         # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        flat = random.sample(range(height * width), mines)
+        self.board.flat[flat] = True
+        self.mines = {divmod(x, width) for x in flat}
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -38,19 +137,17 @@ class Minesweeper():
         Prints a text-based representation
         of where mines are located.
         """
-        for i in range(self.height):
-            print("--" * self.width + "-")
-            for j in range(self.width):
-                if self.board[i][j]:
-                    print("|X", end="")
-                else:
-                    print("| ", end="")
-            print("|")
-        print("--" * self.width + "-")
+        sep = "--" * self.width + "-\n"
+        rows = []
+        for row in self.board:
+            rows.append(sep)
+            rows.append("|" + "|".join("X" if c else " " for c in row) + "|\n")
+        rows.append(sep)
+        sys.stdout.write("".join(rows))
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i, j])
 
     def nearby_mines(self, cell):
         """
@@ -58,15 +155,8 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-        count_mines = 0
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                if (i, j) == cell:
-                    continue
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count_mines += 1
-        return count_mines
+        i, j = cell
+        return int(_nearby(self.board, i, j, self.height, self.width))
 
     def won(self):
         """
@@ -78,55 +168,64 @@ class Minesweeper():
 class Sentence():
     """
     Logical statement about a Minesweeper game
-    A sentence consists of a set of board cells,
-    and a count of the number of those cells which are mines.
+    A sentence consists of a set of board cells, stored as an int bitmask
+    of flat cell indices, and a count of the number of those cells which
+    are mines.
     """
 
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        self.cells = cells
         self.count = count
 
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        return hash((self.cells, self.count))
+
     def __str__(self):
-        return f"{self.cells} = {self.count}"
+        return f"{set(_bits(self.cells))} = {self.count}"
 
     def known_mines(self):
         """
-        Returns the set of all cells in self.cells known to be mines.
+        Returns the bitmask of all cells in self.cells known to be mines.
         """
-        if len(self.cells) == self.count and self.count != 0:
+        if self.cells.bit_count() == self.count and self.count != 0:
             return self.cells
         else:
-            return set()
+            return 0
 
     def known_safes(self):
         """
-        Returns the set of all cells in self.cells known to be safe.
+        Returns the bitmask of all cells in self.cells known to be safe.
         """
         if self.count == 0:
             return self.cells
         else:
-            return set()
-        
+            return 0
 
-    def mark_mine(self, cell):
+    def mark_mine(self, bit):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be a mine.
+        the cell with bitmask `bit` is known to be a mine.
+        Returns whether the sentence changed.
         """
-        if cell in self.cells:
+        if self.cells & bit:
             self.count -= 1
-            self.cells.remove(cell)
+            self.cells &= ~bit
+            return True
+        return False
 
-    def mark_safe(self, cell):
+    def mark_safe(self, bit):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be safe.
+        the cell with bitmask `bit` is known to be safe.
+        Returns whether the sentence changed.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        if self.cells & bit:
+            self.cells &= ~bit
+            return True
+        return False
 
 
 class MinesweeperAI():
@@ -134,39 +233,132 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=8):
 
-        # Set initial height and width
+        # Set initial height, width, and number of mines on the board
         self.height = height
         self.width = width
+        self.total_mines = mines
+
+        # Bitmask of the in-bounds neighbors of every cell
+        self._neighbors = [
+            sum(1 << _enc(i + di, j + dj, width) for di, dj in _OFFS
+                if 0 <= i + di < height and 0 <= j + dj < width)
+            for i in range(height) for j in range(width)
+        ]
 
-        # Keep track of which cells have been clicked on
+        # Keep track of which cells have been clicked on; like every cell
+        # set below, these hold flat i * width + j indices, not (i, j) tuples
         self.moves_made = set()
 
         # Keep track of cells known to be safe or mines
         self.mines = set()
         self.safes = set()
 
+        # Bitmasks mirroring self.mines and self.safes
+        self._mine_bits = 0
+        self._safe_bits = 0
+
+        # Safe cells that have not been played yet
+        self._safe_frontier = set()
+
+        # Flat boolean masks mirroring self.mines and self.moves_made
+        self._mines_mask = np.zeros(height * width, dtype=bool)
+        self._moves_mask = np.zeros(height * width, dtype=bool)
+
+        # Scratch buffer for make_random_move's per-cell mine probabilities
+        self._prob = np.empty(height * width, dtype=np.float32)
+
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # (cells, count) of every sentence, for O(1) duplicate checks
+        self._kb_keys = set()
+
+        # Sentences added or changed since they were last inferred from
+        self._dirty = deque()
+
+        # Sentences containing each flat cell index
+        self._cell_to_sentences = {}
+
+        # Set when marking a cell leaves some sentence with no cells
+        self._has_empty = False
+
+        # Bumped whenever mines, safes or the knowledge base actually change,
+        # so update_knowledge can tell when there is nothing new to infer
+        self._kb_version = 0
+        self._inferred_version = 0
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self._mark_mine(_enc(*cell, self.width))
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
-        self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self._mark_safe(_enc(*cell, self.width))
+
+    def _mark_mine(self, k):
+        """
+        Marks the cell with flat index k as a mine.
+        """
+        if k in self.mines:
+            return
+        self.mines.add(k)
+        self._mines_mask[k] = True
+        self._kb_version += 1
+        bit = 1 << k
+        self._mine_bits |= bit
+        # sentences dropped from the knowledge are empty and fail the bit test
+        for sentence in self._cell_to_sentences.pop(k, ()):
+            key = (sentence.cells, sentence.count)
+            if sentence.mark_mine(bit):
+                self._kb_keys.discard(key)
+                self._kb_keys.add((sentence.cells, sentence.count))
+                if not sentence.cells:
+                    self._has_empty = True
+                self._dirty.append(sentence)
+
+    def _mark_safe(self, k):
+        """
+        Marks the cell with flat index k as safe.
+        """
+        if k in self.safes:
+            return
+        self.safes.add(k)
+        if k not in self.moves_made:
+            self._safe_frontier.add(k)
+        self._kb_version += 1
+        bit = 1 << k
+        self._safe_bits |= bit
+        # sentences dropped from the knowledge are empty and fail the bit test
+        for sentence in self._cell_to_sentences.pop(k, ()):
+            key = (sentence.cells, sentence.count)
+            if sentence.mark_safe(bit):
+                self._kb_keys.discard(key)
+                self._kb_keys.add((sentence.cells, sentence.count))
+                if not sentence.cells:
+                    self._has_empty = True
+                self._dirty.append(sentence)
+
+    def _add_sentence(self, cells, count):
+        """
+        Adds a new sentence to the knowledge base and queues it
+        for inference.
+        """
+        sentence = Sentence(cells, count)
+        self.knowledge.append(sentence)
+        self._kb_keys.add((cells, count))
+        self._dirty.append(sentence)
+        self._kb_version += 1
+        for k in _bits(cells):
+            self._cell_to_sentences.setdefault(k, []).append(sentence)
+        return sentence
 
     def add_knowledge(self, cell, count):
         """
@@ -183,93 +375,73 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        k = _enc(*cell, self.width)
         #mark as move made
-        self.moves_made.add(cell)
+        self.moves_made.add(k)
+        self._moves_mask[k] = True
+        self._safe_frontier.discard(k)
         #mark as safe
-        self.mark_safe(cell)
+        self._mark_safe(k)
         #add to knowledge base
 
-        neighbors = set()
-        known_mines_count = 0
-
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                if (i, j) == cell:
-                    continue
-                if (i, j) in self.safes:
-                    continue
-                if (i, j) in self.mines:
-                    count = count - 1
-                    continue
-
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if (i, j) in self.mines:
-                        known_mines_count += 1
-                    elif (i, j) not in self.mines:
-                        neighbors.add((i, j))
-        
-        adjusted_count = count - known_mines_count
+        around = self._neighbors[k]
+        count -= (around & self._mine_bits).bit_count()
+        neighbors = around & ~(self._mine_bits | self._safe_bits)
 
         if neighbors:
-            self.knowledge.append(Sentence(neighbors, adjusted_count))
+            self._add_sentence(neighbors, count)
 
         self.update_knowledge()
 
     def update_knowledge(self):
         """Update the AI's knowledge base to the mark new cells as safe or as
         mines based on current information"""
-        changed = True
-        while changed:
-            changed = False
-            new_mines = set()
-            new_safes = set()
-
-            for sentence in self.knowledge:
-                known_mines = sentence.known_mines()
-                known_safes = sentence.known_safes()
-
-                if known_mines:
-                    new_mines.update(known_mines)
-                    # update the new set by adding mines we just concluded
-                if known_safes:
-                    new_safes.update(known_safes)
-            
-            for mine in new_mines:
-                if mine not in self.mines:
-                    self.mark_mine(mine)
-                    changed = True
-                    #update internal knowledge
-            
-            for safe in new_safes:
-                if safe not in self.safes:
-                    self.mark_safe(safe)
-                    changed = True
-
-            # make sure no knowledge sentence is empty from the reducing of cells above
-            self.knowledge = [sentence for sentence in self.knowledge if sentence.cells]
-
-            # creating new logic from existing ones
-            for i, sentence1 in enumerate(self.knowledge):
-                for sentence2 in self.knowledge[i + 1:]:
-                    if sentence1 == sentence2:
-                        continue
-
-                    if sentence2.cells.issubset(sentence1.cells) and sentence2.cells:
-                        new_cells = sentence1.cells - sentence2.cells
-                        new_count = sentence1.count - sentence2.count
-
-                        if new_count >= 0:
-                            """add new knowledge"""
-                            inferred_sentence = Sentence(new_cells, new_count)
-                            if inferred_sentence not in self.knowledge:
-                                print("New knowledge: ", inferred_sentence)
-                                self.knowledge.append(inferred_sentence)
-                                changed = True
-        
-        print("Current AI KB length: ", self.knowledge)
-        print("Mines found: ", self.mines)
-        print("Safe cells remaining: ", self.safes - self.moves_made)
-        print("==============================================================================")
+        # no new mines, safes or sentences since the last call: nothing to infer
+        if self._kb_version == self._inferred_version:
+            return
+
+        while self._dirty:
+            sentence1 = self._dirty.popleft()
+            if not sentence1.cells:
+                continue
+
+            # marking a cell updates and queues every sentence containing it,
+            # this one included
+            known_mines = sentence1.known_mines()
+            known_safes = sentence1.known_safes()
+            for mine in _bits(known_mines):
+                self._mark_mine(mine)
+            for safe in _bits(known_safes):
+                self._mark_safe(safe)
+            if not sentence1.cells:
+                continue
+
+            # creating new logic from this sentence and every other one,
+            # keeping one sentence per cell set when several pairs agree
+            pending = {}
+            for new_cells, new_count in _infer(sentence1, self.knowledge):
+                pending.setdefault(new_cells, new_count)
+
+            kb_keys = self._kb_keys
+            for key in pending.items():
+                if key not in kb_keys:
+                    """add new knowledge"""
+                    inferred_sentence = self._add_sentence(*key)
+                    log.debug("New knowledge: %s", inferred_sentence)
+
+        # make sure no knowledge sentence is empty from the reducing of cells above
+        if self._has_empty:
+            self.knowledge[:] = [sentence for sentence in self.knowledge if sentence.cells]
+            self._kb_keys = {(sentence.cells, sentence.count) for sentence in self.knowledge}
+            self._has_empty = False
+
+        self._inferred_version = self._kb_version
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Current AI KB length: %d", len(self.knowledge))
+            log.debug("Mines found: %s", {_dec(k, self.width) for k in self.mines})
+            log.debug("Safe cells remaining: %s",
+                      {_dec(k, self.width) for k in self._safe_frontier})
 
     def make_safe_move(self):
         """
@@ -280,9 +452,8 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for move in self.safes:
-            if move not in self.moves_made:
-                return move
+        for k in self._safe_frontier:
+            return _dec(k, self.width)
         return None
 
     def make_random_move(self):
@@ -293,51 +464,45 @@ class MinesweeperAI():
             2) are not known to be mines
         """
 
-        moves = {} # dict for moves
-        MINES = 8
-
         #mines left on the board
-        nums_mines_left = MINES - len(self.mines)
+        nums_mines_left = self.total_mines - len(self.mines)
         #the moves we have left
         spaces_left = (self.height * self.width) - (len(self.mines) + len(self.moves_made))
         if spaces_left == 0:
             return None
-        
+
         basic_prob = nums_mines_left / spaces_left
-        #assign every leftover moves with that probability
-        for i in range(self.height):
-            for j in range(self.width):
-                if (i, j) not in self.mines and (i, j) not in self.moves_made:
-                    moves[(i, j)] = basic_prob
+        #assign every leftover move that probability, and rule out the rest
+        flat = self._prob
+        flat.fill(basic_prob)
+        flat[self._mines_mask] = np.inf
+        flat[self._moves_mask] = np.inf
 
-        if not moves:
-            #no moves available
-            return None
-        
         if not self.knowledge:
             #completely random board
-            print("The AI is making a random choice based on basic probability")
-            return random.choice(list(moves.keys()))
-        
+            moves = np.flatnonzero(np.isfinite(flat))
+            if moves.size == 0:
+                #no moves available
+                return None
+            log.debug("The AI is making a random choice based on basic probability")
+            return _dec(int(random.choice(moves)), self.width)
+
         # making a more educated guess
         for sentence in self.knowledge:
-            num_cells = len(sentence.cells)
+            num_cells = sentence.cells.bit_count()
             if num_cells == 0:
                 continue
 
-            calculated_prob = sentence.count / num_cells
+            idx = np.fromiter(_bits(sentence.cells), dtype=np.int32, count=num_cells)
             # update probability if the new one is higher to be bomb
-            for cell in sentence.cells:
-                if cell in moves:
-                    moves[cell] = max(moves[cell], calculated_prob)
-
-        min_prob = min(moves.values())
-        best_moves = [cell for cell, prob in moves.items() if prob == min_prob]
-        
-        move = random.choice(best_moves)
-        print("The AI is making an informed choice based on the lowest mine possibility", move)
-        return move
+            np.maximum.at(flat, idx, sentence.count / num_cells)
 
-        
-                
+        min_prob = flat.min()
+        if min_prob == np.inf:
+            #no moves available
+            return None
+        best_moves = np.flatnonzero(flat == min_prob)
 
+        move = _dec(int(random.choice(best_moves)), self.width)
+        log.debug("The AI is making an informed choice based on the lowest mine possibility %s", move)
+        return move
@@ -0,0 +1,7 @@
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="minesweeper-inference",
+    ext_modules=cythonize("_inference.pyx"),
+)